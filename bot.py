@@ -1,27 +1,69 @@
 import asyncio
+import functools
+import heapq
+import html
+import itertools
 import logging
 import os
+import re
+import sqlite3
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Literal
 
 import aiosqlite
+import orjson
 from aiogram import Bot, Dispatcher, F, Router
-from aiogram.filters import Command, CommandStart
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.filters import Command, CommandStart, StateFilter
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StateType, StorageKey
+from aiogram.methods import SendDocument, SendMediaGroup, SendMessage, SendPhoto, SendVideo
 from aiogram.types import (
     CallbackQuery,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    InputMediaPhoto,
+    InputMediaVideo,
     Message,
 )
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:  # not available on Windows
+    uvloop = None
+
 load_dotenv()
 
-BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
-ADMIN_ID: int = int(os.getenv("ADMIN_ID", "0"))
-DB_PATH: str = os.getenv("DB_PATH", "complaints.db")
-LOG_CHAT_ID: int = int(os.getenv("LOG_CHAT_ID", "0"))
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    bot_token: str
+    admin_id: int
+    db_path: str
+    log_chat_id: int
+
+
+CFG = Config(
+    bot_token=os.getenv("BOT_TOKEN", ""),
+    admin_id=int(os.getenv("ADMIN_ID", "0")),
+    db_path=os.getenv("DB_PATH", "complaints.db"),
+    log_chat_id=int(os.getenv("LOG_CHAT_ID", "0")),
+)
+if not CFG.bot_token:
+    raise ValueError("BOT_TOKEN не задан в .env")
+if not CFG.admin_id:
+    raise ValueError("ADMIN_ID не задан в .env")
+ADMIN_IDS: frozenset[int] = frozenset({CFG.admin_id})
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -55,111 +97,817 @@ class RejectForm(StatesGroup):
     reason = State()
 
 
+# ---------------------------------------------------------------------------
+# FSM storage
+# ---------------------------------------------------------------------------
+
+@dataclass(slots=True)
+class _FormRecord:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    touched: float = field(default_factory=time.monotonic)
+
+
+class DictStorage(BaseStorage):
+    """In-process FSM storage backed by a plain dict.
+
+    Unlike MemoryStorage, reads never create records and cleared forms are
+    dropped, so users who only send /start leave nothing behind. Forms idle
+    for longer than ``ttl`` seconds are evicted by a periodic sweep, and at
+    most ``max_records`` forms are kept, evicting the least recently written.
+    """
+
+    def __init__(self, ttl: float = 3600, sweep_interval: float = 300, max_records: int = 10_000) -> None:
+        # Ordered from least to most recently written.
+        self._records: dict[StorageKey, _FormRecord] = {}
+        self._ttl = ttl
+        self._sweep_interval = sweep_interval
+        self._max_records = max_records
+        self._sweeper: asyncio.Task | None = None
+
+    def _record(self, key: StorageKey) -> _FormRecord:
+        rec = self._records.pop(key, None)
+        if rec is None:
+            rec = _FormRecord()
+            if len(self._records) >= self._max_records:
+                del self._records[next(iter(self._records))]
+            if self._sweeper is None:
+                self._sweeper = asyncio.create_task(self._sweep())
+        else:
+            rec.touched = time.monotonic()
+        self._records[key] = rec
+        return rec
+
+    def _drop_if_empty(self, key: StorageKey, rec: _FormRecord) -> None:
+        if rec.state is None and not rec.data:
+            self._records.pop(key, None)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self._sweep_interval)
+            cutoff = time.monotonic() - self._ttl
+            stale = list(itertools.takewhile(
+                lambda k: self._records[k].touched < cutoff, self._records
+            ))
+            for k in stale:
+                del self._records[k]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        if state is None and key not in self._records:
+            return
+        rec = self._record(key)
+        rec.state = state
+        self._drop_if_empty(key, rec)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        rec = self._records.get(key)
+        return rec.state if rec else None
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        if not data and key not in self._records:
+            return
+        rec = self._record(key)
+        rec.data = data.copy()
+        self._drop_if_empty(key, rec)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        rec = self._records.get(key)
+        return rec.data.copy() if rec else {}
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        self._records.clear()
+
+
+class ChatEventIsolation(BaseEventIsolation):
+    """Handle one update at a time per FSM key, taking the lock before the
+    state is loaded.
+
+    Like SimpleEventIsolation, but locks are held weakly and disappear once
+    no update of that chat holds or awaits them, so idle users leave no lock
+    behind."""
+
+    def __init__(self) -> None:
+        self._locks: weakref.WeakValueDictionary[StorageKey, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            yield
+
+    async def close(self) -> None:
+        self._locks.clear()
+
+
+# ---------------------------------------------------------------------------
+# Callback data
+# ---------------------------------------------------------------------------
+
+class ComplaintCB(CallbackData, prefix="c"):
+    action: Literal["accept", "reject", "block"]
+    cid: int
+
+
 # ---------------------------------------------------------------------------
 # Database
 # ---------------------------------------------------------------------------
 
+@dataclass(frozen=True, slots=True)
+class ComplaintRow:
+    id: int
+    user_id: int
+    username: str | None
+    fio: str
+    officer_info: str
+    violation: str
+    media_file_id: str | None
+    media_type: str | None
+
+
+# Shared connection, opened once in main() and reused by every handler.
+DB: aiosqlite.Connection | None = None
+# Held around every transaction on DB so one coroutine's commit or
+# rollback never covers another's half-finished writes.
+DB_WRITE_LOCK = asyncio.Lock()
+
+# Point lookups skip aiosqlite's worker thread and run on the event loop:
+# under WAL a keyed SELECT takes microseconds, less than the thread hop.
+# Opened read-only, so it never contends with DB for the write lock. Closed
+# and left None if WAL can't be enabled, since a rollback-journal reader
+# waits out writers and would stall the loop; see fetch_one().
+READ_DB: sqlite3.Connection | None = None
+
+# In-memory mirror of blocked_users; the table stays the source of truth.
+BLOCKED_IDS: set[int] = set()
+# Registered employees and complaint recipients (admin first); rebuilt from
+# employees by reload_staff() whenever registration changes.
+REGISTERED_EMPLOYEE_IDS: frozenset[int] = frozenset()
+RECIPIENT_IDS: list[int] = [CFG.admin_id]
+# (fio, position, rank, nickname) of registered employees by user_id, for
+# the staff card in log posts.
+EMPLOYEE_CARDS: dict[int, tuple] = {}
+# Lower-cased usernames of all added employees, registered or not.
+EMPLOYEE_USERNAMES: set[str] = set()
+
+# Hot-path statements, named so the writer ops and the queries that build on
+# them (e.g. the multi-row INSERT) share one definition.
+SQL_INSERT_COMPLAINTS = (
+    "INSERT INTO complaints (user_id, username, fio, officer_info, violation, media_file_id, media_type)"
+    " VALUES "
+)
+COMPLAINT_ROW_PLACEHOLDERS = "(?,?,?,?,?,?,?)"
+SQL_SELECT_RECIPIENTS = (
+    "SELECT user_id, fio, position, rank, nickname FROM employees"
+    " WHERE registered=1 AND user_id IS NOT NULL"
+)
+# Columns of ComplaintRow, in field order.
+COMPLAINT_ROW_COLUMNS = "id, user_id, username, fio, officer_info, violation, media_file_id, media_type"
+SQL_ACCEPT_COMPLAINT = (
+    "UPDATE complaints SET status='accepted', accepted_by=?"
+    f" WHERE id=? AND status='pending' RETURNING {COMPLAINT_ROW_COLUMNS}"
+)
+SQL_REJECT_COMPLAINT = (
+    "UPDATE complaints SET status='rejected', accepted_by=?"
+    f" WHERE id=? AND status='pending' RETURNING {COMPLAINT_ROW_COLUMNS}"
+)
+SQL_BLOCK_COMPLAINT = (
+    "UPDATE complaints SET status='blocked', accepted_by=?"
+    f" WHERE id=? AND status='pending' RETURNING {COMPLAINT_ROW_COLUMNS}"
+)
+SQL_INSERT_COMPLAINT_MESSAGES = "INSERT INTO complaint_messages (complaint_id, chat_id, message_id) VALUES (?,?,?)"
+SQL_INSERT_BLOCKED = "INSERT OR IGNORE INTO blocked_users (user_id, username) VALUES (?,?)"
+# sqlite3 keeps 128 prepared statements per connection by default. The
+# multi-row complaint INSERT has a variant per batch size, which together
+# with the handler queries can overflow that and evict the hot statements.
+STATEMENT_CACHE_SIZE = 256
+
+
+async def open_db() -> None:
+    global DB, READ_DB
+    DB = await aiosqlite.connect(CFG.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+    # DB has created the file by now, which mode=ro requires.
+    READ_DB = sqlite3.connect(
+        f"file:{CFG.db_path}?mode=ro", uri=True, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    READ_DB.executescript("""
+        PRAGMA query_only=ON;
+        PRAGMA mmap_size=268435456;
+        PRAGMA busy_timeout=5000;
+    """)
+
+
+async def fetch_one(sql: str, params: tuple = ()) -> tuple | None:
+    if READ_DB is not None:
+        return READ_DB.execute(sql, params).fetchone()
+    async with DB.execute(sql, params) as cur:
+        return await cur.fetchone()
+
+
+async def fetch_all(sql: str, params: tuple = ()) -> list[tuple]:
+    if READ_DB is not None:
+        return READ_DB.execute(sql, params).fetchall()
+    async with DB.execute(sql, params) as cur:
+        return await cur.fetchall()
+
+
+async def close_db() -> None:
+    if DB is not None:
+        await DB.close()
+    if READ_DB is not None:
+        READ_DB.close()
+
+
+# journal_mode is persisted in the file; the rest are per-connection.
+SCHEMA_SQL = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+
+    BEGIN;
+    CREATE TABLE IF NOT EXISTS complaints (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id       INTEGER NOT NULL,
+        username      TEXT,
+        fio           TEXT NOT NULL,
+        officer_info  TEXT NOT NULL,
+        violation     TEXT NOT NULL,
+        media_file_id TEXT,
+        media_type    TEXT,
+        status        TEXT DEFAULT 'pending',
+        accepted_by   INTEGER,
+        created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS blocked_users (
+        user_id    INTEGER PRIMARY KEY,
+        username   TEXT,
+        blocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS employees (
+        user_id    INTEGER,
+        username   TEXT UNIQUE NOT NULL,
+        fio        TEXT,
+        position   TEXT,
+        rank       TEXT,
+        nickname   TEXT,
+        registered INTEGER DEFAULT 0,
+        added_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS complaint_messages (
+        complaint_id INTEGER NOT NULL,
+        chat_id      INTEGER NOT NULL,
+        message_id   INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_blocked_at ON blocked_users(blocked_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_complaints_status ON complaints(status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_complaint_messages_cid ON complaint_messages(complaint_id);
+    CREATE INDEX IF NOT EXISTS idx_employees_user_id ON employees(user_id) WHERE user_id IS NOT NULL;
+    COMMIT;
+"""
+
+# Columns added after the first release, for databases created before them.
+COMPLAINT_MIGRATIONS = {
+    "officer_info": "ALTER TABLE complaints ADD COLUMN officer_info TEXT NOT NULL DEFAULT '—';",
+    "accepted_by": "ALTER TABLE complaints ADD COLUMN accepted_by INTEGER;",
+}
+
+
 async def init_db() -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS complaints (
-                id            INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id       INTEGER NOT NULL,
-                username      TEXT,
-                fio           TEXT NOT NULL,
-                officer_info  TEXT NOT NULL,
-                violation     TEXT NOT NULL,
-                media_file_id TEXT,
-                media_type    TEXT,
-                status        TEXT DEFAULT 'pending',
-                accepted_by   INTEGER,
-                created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS blocked_users (
-                user_id    INTEGER PRIMARY KEY,
-                username   TEXT,
-                blocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS employees (
-                user_id    INTEGER,
-                username   TEXT UNIQUE NOT NULL,
-                fio        TEXT,
-                position   TEXT,
-                rank       TEXT,
-                nickname   TEXT,
-                registered INTEGER DEFAULT 0,
-                added_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS complaint_messages (
-                complaint_id INTEGER NOT NULL,
-                chat_id      INTEGER NOT NULL,
-                message_id   INTEGER NOT NULL
-            )
-        """)
-        # Migrations for existing databases
-        for col_sql in [
-            "ALTER TABLE complaints ADD COLUMN officer_info TEXT NOT NULL DEFAULT '—'",
-            "ALTER TABLE complaints ADD COLUMN accepted_by INTEGER",
-        ]:
-            try:
-                await db.execute(col_sql)
-            except Exception:
-                pass
-        await db.commit()
+    global READ_DB
+    await DB.executescript(SCHEMA_SQL)
+    # SQLite silently keeps the old journal mode where WAL is unsupported,
+    # e.g. on some network or container volume filesystems.
+    async with DB.execute("PRAGMA journal_mode") as cur:
+        (journal_mode,) = await cur.fetchone()
+    if journal_mode.lower() != "wal":
+        logger.warning(
+            "SQLite is using journal_mode=%s instead of WAL; point reads go through the shared connection",
+            journal_mode,
+        )
+        READ_DB.close()
+        READ_DB = None
+    async with DB.execute("SELECT name FROM pragma_table_info('complaints')") as cur:
+        columns = {r[0] for r in await cur.fetchall()}
+    migrations = [sql for col, sql in COMPLAINT_MIGRATIONS.items() if col not in columns]
+    if migrations:
+        await DB.executescript("BEGIN;" + "".join(migrations) + "COMMIT;")
+
+    async with DB.execute("SELECT user_id FROM blocked_users") as cur:
+        BLOCKED_IDS.update(r[0] for r in await cur.fetchall())
+    async with DB.execute("SELECT username FROM employees") as cur:
+        EMPLOYEE_USERNAMES.update(r[0] for r in await cur.fetchall())
+    await reload_staff()
+
+
+async def reload_staff() -> None:
+    global REGISTERED_EMPLOYEE_IDS, RECIPIENT_IDS, EMPLOYEE_CARDS
+    async with DB.execute(SQL_SELECT_RECIPIENTS) as cur:
+        rows = [r for r in await cur.fetchall() if r[0]]
+    ids = [r[0] for r in rows]
+    REGISTERED_EMPLOYEE_IDS = frozenset(ids)
+    RECIPIENT_IDS = [CFG.admin_id, *ids]
+    EMPLOYEE_CARDS = {r[0]: r[1:] for r in rows}
+
+
+@asynccontextmanager
+async def write_transaction():
+    """Hold DB_WRITE_LOCK for one transaction on DB: commit on success,
+    roll back if the block raises."""
+    async with DB_WRITE_LOCK:
+        try:
+            yield
+        except BaseException:
+            await DB.rollback()
+            raise
+        await DB.commit()
 
 
-async def is_blocked(user_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT 1 FROM blocked_users WHERE user_id=?", (user_id,)) as cur:
-            return await cur.fetchone() is not None
+def _norm_username(username: str | None) -> str:
+    return username.lower() if username else ""
 
 
-async def is_registered_employee(user_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT 1 FROM employees WHERE user_id=? AND registered=1", (user_id,)
-        ) as cur:
-            return await cur.fetchone() is not None
+def is_blocked(user_id: int) -> bool:
+    return user_id in BLOCKED_IDS
+
 
+def is_registered_employee(user_id: int) -> bool:
+    return user_id in REGISTERED_EMPLOYEE_IDS
 
-async def is_staff(user_id: int) -> bool:
-    return user_id == ADMIN_ID or await is_registered_employee(user_id)
 
+def is_staff(user_id: int) -> bool:
+    return user_id in ADMIN_IDS or is_registered_employee(user_id)
 
-async def get_all_recipient_ids(db) -> list[int]:
+
+def get_all_recipient_ids() -> list[int]:
     """Admin + all registered employees."""
-    ids = [ADMIN_ID]
-    async with db.execute("SELECT user_id FROM employees WHERE registered=1 AND user_id IS NOT NULL") as cur:
-        rows = await cur.fetchall()
-    ids.extend(r[0] for r in rows if r[0])
-    return ids
+    return RECIPIENT_IDS
+
+
+# ---------------------------------------------------------------------------
+# Batched writer
+# ---------------------------------------------------------------------------
+
+# Complaint inserts and status changes are queued and applied by a single
+# task, so a burst of submissions and staff clicks shares one transaction
+# and one commit.
+WRITE_BATCH_SIZE = 200
+WRITE_BATCH_WINDOW = 0.05  # seconds
+# Rows per multi-row INSERT, keeping bound parameters under SQLite's
+# conservative 999-variable limit (7 columns per complaint).
+INSERT_CHUNK_ROWS = 999 // 7
+
+# None is queued once on shutdown, after the last accepted write.
+_write_queue: asyncio.Queue[tuple[str, tuple, asyncio.Future] | None] = asyncio.Queue()
+_writer_task: asyncio.Task | None = None
+_writer_closed = False
+# Set if the writer task dies; later writes fail instead of waiting forever.
+_writer_error: BaseException | None = None
+
+
+async def submit_write(op: str, params: tuple) -> Any:
+    """Queue a write and wait until its batch is committed."""
+    if _writer_error is not None:
+        raise RuntimeError("Database writer has crashed") from _writer_error
+    if _writer_closed:
+        raise RuntimeError("Database writer is shut down")
+    fut = asyncio.get_running_loop().create_future()
+    await _write_queue.put((op, params, fut))
+    return await fut
+
+
+async def insert_complaint(params: tuple) -> int:
+    return await submit_write("insert", params)
+
+
+async def collect_batch(queue: asyncio.Queue, max_size: int, window: float) -> list:
+    """Wait for one item, then take whatever else arrives within `window`
+    seconds, up to `max_size` items."""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + window
+    while len(batch) < max_size:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+async def _insert_rows(rows: list[tuple]) -> list[int]:
+    """Insert rows with one multi-row INSERT and return their ids in order."""
+    sql = SQL_INSERT_COMPLAINTS + ",".join([COMPLAINT_ROW_PLACEHOLDERS] * len(rows))
+    cur = await DB.execute(sql, [v for row in rows for v in row])
+    # A single INSERT statement assigns consecutive rowids in VALUES order.
+    last_id = cur.lastrowid
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+async def _accept(params: tuple) -> ComplaintRow | None:
+    async with DB.execute(SQL_ACCEPT_COMPLAINT, params) as cur:
+        row = await cur.fetchone()
+    return ComplaintRow(*row) if row else None
+
+
+async def _reject(params: tuple) -> ComplaintRow | None:
+    async with DB.execute(SQL_REJECT_COMPLAINT, params) as cur:
+        row = await cur.fetchone()
+    return ComplaintRow(*row) if row else None
+
+
+async def _block(params: tuple) -> ComplaintRow | None:
+    async with DB.execute(SQL_BLOCK_COMPLAINT, params) as cur:
+        row = await cur.fetchone()
+    if not row:
+        return None
+    complaint = ComplaintRow(*row)
+    await DB.execute(SQL_INSERT_BLOCKED, (complaint.user_id, complaint.username))
+    return complaint
+
+
+async def _track_messages(rows: tuple) -> None:
+    await DB.executemany(SQL_INSERT_COMPLAINT_MESSAGES, rows)
+
+
+_WRITE_OPS = {"accept": _accept, "reject": _reject, "block": _block, "messages": _track_messages}
+
+
+async def _isolated(op, params) -> Any:
+    """Run one write op in a savepoint, so if it fails only its own changes
+    are undone and the rest of the batch can still commit."""
+    await DB.execute("SAVEPOINT write_op")
+    try:
+        result = await op(params)
+    except Exception:
+        await DB.execute("ROLLBACK TO write_op")
+        raise
+    finally:
+        await DB.execute("RELEASE write_op")
+    return result
+
+
+async def _apply_batch(batch: list[tuple[str, tuple, asyncio.Future]]) -> list[Any]:
+    """Apply queued writes in order; consecutive inserts share statements.
+
+    A failed op leaves its exception in place of its result."""
+    results: list[Any] = [None] * len(batch)
+    inserts: list[int] = []
+
+    async def insert_one(row: tuple) -> int | Exception:
+        try:
+            (complaint_id,) = await _isolated(_insert_rows, [row])
+        except Exception as e:
+            logger.exception("Could not insert complaint from user %s", row[0])
+            return e
+        return complaint_id
+
+    async def flush_inserts() -> None:
+        for i in range(0, len(inserts), INSERT_CHUNK_ROWS):
+            chunk = inserts[i:i + INSERT_CHUNK_ROWS]
+            try:
+                ids = await _isolated(_insert_rows, [batch[j][1] for j in chunk])
+            except sqlite3.IntegrityError:
+                # One bad row aborts the whole statement; redo the chunk row
+                # by row so only that row's submitter gets the error.
+                ids = [await insert_one(batch[j][1]) for j in chunk]
+            except Exception as e:
+                logger.exception("Could not insert %d complaint(s)", len(chunk))
+                ids = [e] * len(chunk)
+            for j, complaint_id in zip(chunk, ids):
+                results[j] = complaint_id
+        inserts.clear()
+
+    # An explicit BEGIN keeps the savepoints nested in one transaction;
+    # releasing an outermost savepoint would commit on its own.
+    await DB.execute("BEGIN")
+    for i, (op, params, _) in enumerate(batch):
+        if op == "insert":
+            inserts.append(i)
+            continue
+        await flush_inserts()
+        try:
+            results[i] = await _isolated(_WRITE_OPS[op], params)
+        except Exception as e:
+            logger.exception("Could not apply queued %s", op)
+            results[i] = e
+    await flush_inserts()
+    return results
+
+
+async def _commit_batch(batch: list[tuple[str, tuple, asyncio.Future]]) -> None:
+    async with DB_WRITE_LOCK:
+        try:
+            results = await _apply_batch(batch)
+            await DB.commit()
+        except Exception as e:
+            logger.exception("Could not apply %d queued write(s)", len(batch))
+            await DB.rollback()
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+    for (_, _, fut), result in zip(batch, results):
+        if fut.done():
+            continue
+        if isinstance(result, Exception):
+            fut.set_exception(result)
+        else:
+            fut.set_result(result)
+
+
+async def db_writer() -> None:
+    while True:
+        batch = await collect_batch(_write_queue, WRITE_BATCH_SIZE, WRITE_BATCH_WINDOW)
+        stopping = batch[-1] is None
+        if stopping:
+            batch.pop()
+        if batch:
+            try:
+                await _commit_batch(batch)
+            except BaseException as e:
+                _fail_writes(batch, e)
+                raise
+        if stopping:
+            return
+
+
+def _fail_writes(items: list[tuple[str, tuple, asyncio.Future]], error: BaseException) -> None:
+    for _, _, fut in items:
+        if not fut.done():
+            fut.set_exception(error)
+
+
+def _writer_done(task: asyncio.Task) -> None:
+    global _writer_error
+    if not task.cancelled() and task.exception() is None:
+        return  # drained by stop_db_writer
+    _writer_error = task.exception() if not task.cancelled() else asyncio.CancelledError()
+    logger.error("Database writer stopped unexpectedly", exc_info=_writer_error)
+    queued = []
+    while not _write_queue.empty():
+        if (item := _write_queue.get_nowait()) is not None:
+            queued.append(item)
+    _fail_writes(queued, RuntimeError("Database writer has crashed"))
+
+
+async def start_db_writer() -> None:
+    global _writer_task
+    _writer_task = asyncio.create_task(db_writer())
+    _writer_task.add_done_callback(_writer_done)
+
+
+async def stop_db_writer() -> None:
+    """Refuse new writes, then let the writer commit everything already
+    queued before close_db runs."""
+    global _writer_closed
+    if _writer_task is None or _writer_closed:
+        return
+    _writer_closed = True
+    if _writer_task.done():
+        return
+    _write_queue.put_nowait(None)
+    await _writer_task
+
+
+# Refresh query planner statistics and fold the WAL back into the main file
+# so it doesn't grow without bound between restarts.
+MAINTENANCE_INTERVAL = 3600  # seconds
+
+_maintenance_task: asyncio.Task | None = None
+
+
+async def db_maintenance() -> None:
+    while True:
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+        try:
+            async with DB_WRITE_LOCK:
+                await DB.execute("PRAGMA optimize")
+                await DB.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception:
+            logger.exception("Database maintenance failed")
+
+
+async def start_db_maintenance() -> None:
+    global _maintenance_task
+    _maintenance_task = asyncio.create_task(db_maintenance())
+
+
+async def stop_db_maintenance() -> None:
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Outgoing rate limiting
+# ---------------------------------------------------------------------------
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+_send_priority: ContextVar[int] = ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+THROTTLED_METHODS = (SendMessage, SendPhoto, SendVideo, SendDocument, SendMediaGroup)
+# Times a request is repeated after Telegram answers 429 with retry_after.
+RETRY_AFTER_ATTEMPTS = 3
+
+
+@contextmanager
+def bulk_sends():
+    """Queue sends made inside the block behind interactive replies."""
+    token = _send_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """Token bucket that keeps outgoing messages under Telegram's ~30 msg/s
+    bot-wide limit instead of running into 429s and retrying."""
+
+    def __init__(self, rate: int = 30, period: float = 1.0) -> None:
+        self._rate = rate
+        self._period = period
+        self._tokens = rate
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._refill_handle: asyncio.TimerHandle | None = None
+
+    async def __call__(self, make_request, bot, method):
+        throttled = isinstance(method, THROTTLED_METHODS)
+        for _ in range(RETRY_AFTER_ATTEMPTS):
+            if throttled:
+                await self._acquire()
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                logger.warning("Flood control on %s, retrying in %ss", type(method).__name__, e.retry_after)
+                await asyncio.sleep(e.retry_after)
+        if throttled:
+            await self._acquire()
+        return await make_request(bot, method)
+
+    async def _acquire(self) -> None:
+        self._schedule_refill()
+        if self._tokens and not self._waiters:
+            self._tokens -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (_send_priority.get(), next(self._seq), fut))
+        await fut
+
+    def _schedule_refill(self) -> None:
+        if self._refill_handle is None:
+            self._refill_handle = asyncio.get_running_loop().call_later(self._period, self._refill)
+
+    def _refill(self) -> None:
+        self._refill_handle = None
+        self._tokens = self._rate
+        while self._tokens and self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                self._tokens -= 1
+        if self._waiters or self._tokens < self._rate:
+            self._schedule_refill()
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+# Strong references to fire-and-forget tasks so they are not garbage-collected
+# mid-flight.
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _task_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background task %s failed", task.get_coro().__qualname__, exc_info=task.exception())
+
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task
+
+
+# Requests in flight per fan-out; SendScheduler still paces the actual rate.
+SEND_CONCURRENCY = 20
+
+
+async def gather_limited(coros, limit: int = SEND_CONCURRENCY) -> list:
+    """Run coroutines concurrently, at most `limit` at a time. Exceptions are
+    returned in place of results."""
+    sem = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with sem:
+            return await coro
+
+    return await asyncio.gather(*map(run, coros), return_exceptions=True)
+
+
+# Telegram caps messages at 4096 characters and inline keyboards at 100
+# buttons; long lists are split into pages well below both.
+PAGE_MAX_CHARS = 3500
+PAGE_MAX_BUTTONS = 50
+
+
+async def answer_paged(message: Message, header: str, entries, sep: str = "\n") -> None:
+    """Send (text, button) entries as few messages as possible, one keyboard
+    row per entry."""
+    parts, rows, size = [header], [], len(header)
+    for text, button in entries:
+        if rows and (size + len(sep) + len(text) > PAGE_MAX_CHARS or len(rows) >= PAGE_MAX_BUTTONS):
+            await message.answer(sep.join(parts), reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
+            parts, rows, size = [], [], 0
+        parts.append(text)
+        rows.append([button])
+        size += len(sep) + len(text)
+    await message.answer(sep.join(parts), reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
+
+
+async def drop_pressed_button(callback: CallbackQuery) -> None:
+    """Remove the pressed button's row, keeping the rest of the keyboard."""
+    markup = callback.message.reply_markup
+    rows = [
+        row for row in (markup.inline_keyboard if markup else [])
+        if row[0].callback_data != callback.data
+    ]
+    await callback.message.edit_reply_markup(
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+    )
+
+
+async def notify_user(bot: Bot, user_id: int, text: str) -> None:
+    try:
+        await bot.send_message(user_id, text)
+    except TelegramAPIError as e:
+        logger.warning("Could not notify user %s: %s", user_id, e)
+
+
+COMPLAINT_ACTIONS = (
+    ("✅ Принять",       "accept"),
+    ("❌ Отклонить",     "reject"),
+    ("🚫 Заблокировать", "block"),
+)
+
+
+# Media senders are bound once the Bot exists; media_type is mapped to an
+# index so the send paths do not rebuild a dispatch dict per message.
+_MEDIA_INDEX = {"photo": 0, "video": 1, "document": 2}
+MEDIA_SENDERS: tuple = ()
+
+
+def bind_media_senders(bot: Bot) -> None:
+    global MEDIA_SENDERS
+    MEDIA_SENDERS = (bot.send_photo, bot.send_video, bot.send_document)
+
+
+def media_sender(media_type: str | None):
+    return MEDIA_SENDERS[_MEDIA_INDEX.get(media_type, 2)]
+
+
+# Markups are never mutated after construction, so one object per complaint
+# can be shared by every send of it.
+@functools.lru_cache(maxsize=4096)
 def complaint_keyboard(complaint_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[[
-        InlineKeyboardButton(text="✅ Принять",       callback_data=f"accept_{complaint_id}"),
-        InlineKeyboardButton(text="❌ Отклонить",     callback_data=f"reject_{complaint_id}"),
-        InlineKeyboardButton(text="🚫 Заблокировать", callback_data=f"block_{complaint_id}"),
+        InlineKeyboardButton(text=label, callback_data=ComplaintCB(action=action, cid=complaint_id).pack())
+        for label, action in COMPLAINT_ACTIONS
     ]])
 
 
+COMPLAINT_BODY_TEMPLATE = (
+    "👤 <b>От:</b> {uname} (ID: <code>{user_id}</code>)\n"
+    "📋 <b>ФИО заявителя:</b> {fio}\n"
+    "👮 <b>Сотрудник / жетон:</b> {officer_info}\n"
+    "⚠️ <b>Нарушение:</b> {violation}"
+)
+COMPLAINT_TEMPLATE = "📨 <b>Новая жалоба #{complaint_id}</b>\n\n" + COMPLAINT_BODY_TEMPLATE
+
+
+@functools.lru_cache(maxsize=1024)
+def format_username(username: str | None) -> str:
+    return f"@{username}" if username else "без username"
+
+
 def build_complaint_text(complaint_id, uname, user_id, fio, officer_info, violation) -> str:
-    return (
-        f"📨 <b>Новая жалоба #{complaint_id}</b>\n\n"
-        f"👤 <b>От:</b> {uname} (ID: <code>{user_id}</code>)\n"
-        f"📋 <b>ФИО заявителя:</b> {fio}\n"
-        f"👮 <b>Сотрудник / жетон:</b> {officer_info}\n"
-        f"⚠️ <b>Нарушение:</b> {violation}"
+    return COMPLAINT_TEMPLATE.format(
+        complaint_id=complaint_id, uname=uname, user_id=user_id,
+        fio=fio, officer_info=officer_info, violation=violation,
     )
 
 
@@ -167,45 +915,42 @@ async def send_complaint_to_all(bot: Bot, complaint_id: int, text: str,
                                  media_file_id: str | None, media_type: str | None,
                                  recipients: list[int]) -> None:
     keyboard = complaint_keyboard(complaint_id)
+
+    # Same call for every recipient; only the chat id varies.
+    if media_file_id and media_type != "link":
+        send_fn, body, kwargs = media_sender(media_type), media_file_id, {"caption": text, "reply_markup": keyboard}
+    else:
+        if media_type == "link":
+            text += f"\n🔗 <b>Доказательство:</b> {media_file_id}"
+        send_fn, body, kwargs = bot.send_message, text, {"reply_markup": keyboard}
+
+    with bulk_sends():
+        results = await gather_limited(send_fn(rid, body, **kwargs) for rid in recipients)
     msg_rows = []
-    for rid in recipients:
-        try:
-            if media_file_id and media_type != "link":
-                send_fn = {
-                    "photo": bot.send_photo,
-                    "video": bot.send_video,
-                    "document": bot.send_document,
-                }.get(media_type, bot.send_document)
-                sent = await send_fn(rid, media_file_id, caption=text, parse_mode="HTML", reply_markup=keyboard)
-            else:
-                full_text = text + (f"\n🔗 <b>Доказательство:</b> {media_file_id}" if media_type == "link" else "")
-                sent = await bot.send_message(rid, full_text, parse_mode="HTML", reply_markup=keyboard)
+    for rid, sent in zip(recipients, results):
+        if isinstance(sent, BaseException):
+            logger.warning("Could not send complaint to %s: %s", rid, sent)
+        else:
             msg_rows.append((complaint_id, rid, sent.message_id))
-        except Exception as e:
-            logger.warning("Could not send complaint to %s: %s", rid, e)
 
     if msg_rows:
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.executemany(
-                "INSERT INTO complaint_messages (complaint_id, chat_id, message_id) VALUES (?,?,?)",
-                msg_rows,
-            )
-            await db.commit()
+        await submit_write("messages", tuple(msg_rows))
 
 
 async def invalidate_complaint_messages(bot: Bot, complaint_id: int) -> None:
     """Remove inline keyboards from all complaint notification messages."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT chat_id, message_id FROM complaint_messages WHERE complaint_id=?",
-            (complaint_id,),
-        ) as cur:
-            rows = await cur.fetchall()
-    for chat_id, message_id in rows:
-        try:
-            await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=None)
-        except Exception:
-            pass
+    rows = await fetch_all(
+        "SELECT chat_id, message_id FROM complaint_messages WHERE complaint_id=?",
+        (complaint_id,),
+    )
+    results = await gather_limited(
+        bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=None)
+        for chat_id, message_id in rows
+    )
+    for (chat_id, message_id), result in zip(rows, results):
+        # Usually the message was deleted or already had no keyboard.
+        if isinstance(result, BaseException):
+            logger.debug("Could not clear keyboard of %s/%s: %s", chat_id, message_id, result)
 
 
 # ---------------------------------------------------------------------------
@@ -215,9 +960,9 @@ async def invalidate_complaint_messages(bot: Bot, complaint_id: int) -> None:
 @router.message(CommandStart())
 async def cmd_start(message: Message) -> None:
     uid = message.from_user.id
-    username = (message.from_user.username or "").lower()
+    username = _norm_username(message.from_user.username)
 
-    if uid == ADMIN_ID:
+    if uid in ADMIN_IDS:
         await message.answer(
             "👮 <b>Добро пожаловать, Администратор!</b>\n\n"
             "Команды:\n"
@@ -225,27 +970,23 @@ async def cmd_start(message: Message) -> None:
             "/staff — список сотрудников\n"
             "/blocked — заблокированные пользователи\n"
             "/complaints — активные жалобы",
-            parse_mode="HTML",
         )
         return
 
-    if await is_blocked(uid):
+    if is_blocked(uid):
         await message.answer("❌ Вы заблокированы и не можете использовать этого бота.")
         return
 
     # Auto-link employee by username on first /start
-    if username:
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute(
-                "SELECT user_id, registered FROM employees WHERE username=?", (username,)
-            ) as cur:
-                row = await cur.fetchone()
+    if username in EMPLOYEE_USERNAMES:
+        row = await fetch_one(
+            "SELECT user_id, registered FROM employees WHERE username=?", (username,)
+        )
         if row:
             emp_uid, registered = row
             if not emp_uid:
-                async with aiosqlite.connect(DB_PATH) as db:
-                    await db.execute("UPDATE employees SET user_id=? WHERE username=?", (uid, username))
-                    await db.commit()
+                async with write_transaction():
+                    await DB.execute("UPDATE employees SET user_id=? WHERE username=?", (uid, username))
             if not registered:
                 await message.answer(
                     "👋 Вы добавлены как сотрудник ОСБ ГАИ.\n"
@@ -257,14 +998,12 @@ async def cmd_start(message: Message) -> None:
                     "Команды:\n"
                     "/complaints — активные жалобы\n"
                     "/register — пройти регистрацию заново",
-                    parse_mode="HTML",
                 )
             return
 
     await message.answer(
         "👋 Добро пожаловать в <b>Веб-приёмную жалоб ОСБ ГАИ</b>!\n\n"
         "Используйте /complaint чтобы подать жалобу на сотрудника.",
-        parse_mode="HTML",
     )
 
 
@@ -275,71 +1014,75 @@ async def cmd_start(message: Message) -> None:
 @router.message(Command("register"))
 async def cmd_register(message: Message, state: FSMContext) -> None:
     uid = message.from_user.id
-    username = (message.from_user.username or "").lower()
+    username = _norm_username(message.from_user.username)
 
-    if uid == ADMIN_ID:
+    if uid in ADMIN_IDS:
         return
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT 1 FROM employees WHERE username=? OR user_id=?", (username, uid)
-        ) as cur:
-            row = await cur.fetchone()
+    row = await fetch_one(
+        "SELECT 1 FROM employees WHERE username=? OR user_id=?", (username, uid)
+    )
 
     if not row:
         await message.answer("❌ Вы не добавлены как сотрудник. Обратитесь к администратору.")
         return
 
     if username:
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute(
+        async with write_transaction():
+            await DB.execute(
                 "UPDATE employees SET user_id=? WHERE username=? AND (user_id IS NULL OR user_id=0)",
                 (uid, username),
             )
-            await db.commit()
 
     await state.set_state(EmployeeRegisterForm.fio)
     await message.answer(
         "📝 <b>Регистрация сотрудника</b>\n\nШаг 1/4: Введите ваше ФИО:",
-        parse_mode="HTML",
     )
 
 
-@router.message(EmployeeRegisterForm.fio)
+@router.message(EmployeeRegisterForm.fio, F.text)
 async def reg_fio(message: Message, state: FSMContext) -> None:
     await state.update_data(fio=message.text)
     await state.set_state(EmployeeRegisterForm.position)
     await message.answer("Шаг 2/4: Введите вашу должность:")
 
 
-@router.message(EmployeeRegisterForm.position)
+@router.message(EmployeeRegisterForm.position, F.text)
 async def reg_position(message: Message, state: FSMContext) -> None:
     await state.update_data(position=message.text)
     await state.set_state(EmployeeRegisterForm.rank)
     await message.answer("Шаг 3/4: Введите ваше звание:")
 
 
-@router.message(EmployeeRegisterForm.rank)
+@router.message(EmployeeRegisterForm.rank, F.text)
 async def reg_rank(message: Message, state: FSMContext) -> None:
     await state.update_data(rank=message.text)
     await state.set_state(EmployeeRegisterForm.nickname)
     await message.answer("Шаг 4/4: Введите ваш никнейм (как вас называть):")
 
 
-@router.message(EmployeeRegisterForm.nickname)
+@router.message(EmployeeRegisterForm.nickname, F.text)
 async def reg_nickname(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     await state.clear()
     uid = message.from_user.id
-    username = (message.from_user.username or "").lower()
-
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE employees SET fio=?, position=?, rank=?, nickname=?, registered=1, user_id=?"
-            " WHERE username=? OR user_id=?",
-            (data["fio"], data["position"], data["rank"], message.text, uid, username, uid),
+    username = _norm_username(message.from_user.username)
+
+    profile = (data["fio"], data["position"], data["rank"], message.text)
+    async with write_transaction():
+        # cmd_register has linked user_id already; the username match only
+        # covers rows it could not link.
+        cur = await DB.execute(
+            "UPDATE employees SET fio=?, position=?, rank=?, nickname=?, registered=1 WHERE user_id=?",
+            (*profile, uid),
         )
-        await db.commit()
+        if not cur.rowcount and username:
+            await DB.execute(
+                "UPDATE employees SET fio=?, position=?, rank=?, nickname=?, registered=1, user_id=?"
+                " WHERE username=?",
+                (*profile, uid, username),
+            )
+    await reload_staff()
 
     await message.answer(
         f"✅ <b>Регистрация завершена!</b>\n\n"
@@ -349,7 +1092,6 @@ async def reg_nickname(message: Message, state: FSMContext) -> None:
         f"📛 Никнейм: {message.text}\n\n"
         "Жалобы будут поступать к вам автоматически.\n"
         "Команды:\n/complaints — активные жалобы",
-        parse_mode="HTML",
     )
 
 
@@ -359,32 +1101,34 @@ async def reg_nickname(message: Message, state: FSMContext) -> None:
 
 @router.message(Command("add_employee"))
 async def cmd_add_employee(message: Message, state: FSMContext) -> None:
-    if message.from_user.id != ADMIN_ID:
+    if message.from_user.id not in ADMIN_IDS:
         return
     await state.set_state(AddEmployeeForm.username)
     await message.answer("Введите Telegram username сотрудника (с @ или без):")
 
 
-@router.message(AddEmployeeForm.username)
+@router.message(AddEmployeeForm.username, F.text)
 async def process_add_employee(message: Message, state: FSMContext) -> None:
     await state.clear()
-    username = message.text.lstrip("@").lower().strip()
+    username = _norm_username(message.text.strip().lstrip("@"))
     if not username:
         await message.answer("❌ Некорректный username.")
         return
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT 1 FROM employees WHERE username=?", (username,)) as cur:
-            exists = await cur.fetchone()
-        if exists:
-            await message.answer(f"⚠️ Сотрудник @{username} уже добавлен.")
-            return
-        await db.execute("INSERT INTO employees (username) VALUES (?)", (username,))
-        await db.commit()
+    async with write_transaction():
+        async with DB.execute(
+            "INSERT OR IGNORE INTO employees (username) VALUES (?) RETURNING 1", (username,)
+        ) as cur:
+            inserted = await cur.fetchone()
+    if not inserted:
+        await message.answer(f"⚠️ Сотрудник @{username} уже добавлен.", parse_mode=None)
+        return
+    EMPLOYEE_USERNAMES.add(username)
 
     await message.answer(
         f"✅ Сотрудник @{username} добавлен.\n"
-        "Когда он запустит бота и пройдёт /register, он сможет работать."
+        "Когда он запустит бота и пройдёт /register, он сможет работать.",
+        parse_mode=None,
     )
 
 
@@ -392,50 +1136,54 @@ async def process_add_employee(message: Message, state: FSMContext) -> None:
 # Admin: /staff
 # ---------------------------------------------------------------------------
 
+STAFF_CARD_TEMPLATE = (
+    "@{username}\n"
+    "📋 ФИО: {fio}\n"
+    "🏷 Должность: {position}\n"
+    "⭐ Звание: {rank}\n"
+    "📛 Никнейм: {nickname}\n"
+    "Статус: {status}"
+)
+
+
 @router.message(Command("staff"))
 async def cmd_staff(message: Message) -> None:
-    if message.from_user.id != ADMIN_ID:
+    if message.from_user.id not in ADMIN_IDS:
         return
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT user_id, username, fio, position, rank, nickname, registered FROM employees ORDER BY added_at DESC"
-        ) as cur:
-            employees = await cur.fetchall()
+    async with DB.execute(
+        "SELECT user_id, username, fio, position, rank, nickname, registered FROM employees ORDER BY added_at DESC"
+    ) as cur:
+        employees = await cur.fetchall()
 
     if not employees:
         await message.answer("📋 Список сотрудников пуст. Используйте /add_employee")
         return
 
-    await message.answer(f"👥 <b>Сотрудники ({len(employees)}):</b>", parse_mode="HTML")
-    for emp in employees:
+    def entry(emp: tuple) -> tuple[str, InlineKeyboardButton]:
         emp_uid, username, fio, position, rank, nickname, registered = emp
         status = "✅ Зарегистрирован" if registered else "⏳ Ожидает регистрации"
-        text = (
-            f"@{username}\n"
-            f"📋 ФИО: {fio or '—'}\n"
-            f"🏷 Должность: {position or '—'}\n"
-            f"⭐ Звание: {rank or '—'}\n"
-            f"📛 Никнейм: {nickname or '—'}\n"
-            f"Статус: {status}"
-        )
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="🗑 Удалить", callback_data=f"demp_{username}"),
-        ]])
-        await message.answer(text, reply_markup=keyboard)
+        text = html.escape(STAFF_CARD_TEMPLATE.format(
+            username=username, fio=fio or "—", position=position or "—",
+            rank=rank or "—", nickname=nickname or "—", status=status,
+        ), quote=False)
+        return text, InlineKeyboardButton(text=f"🗑 Удалить @{username}", callback_data=f"demp_{username}")
+
+    await answer_paged(message, f"👥 <b>Сотрудники ({len(employees)}):</b>", map(entry, employees), sep="\n\n")
 
 
 @router.callback_query(F.data.startswith("demp_"))
 async def delete_employee(callback: CallbackQuery) -> None:
-    if callback.from_user.id != ADMIN_ID:
+    if callback.from_user.id not in ADMIN_IDS:
         await callback.answer()
         return
-    username = callback.data[5:]  # strip "demp_"
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM employees WHERE username=?", (username,))
-        await db.commit()
-    await callback.message.edit_reply_markup(reply_markup=None)
-    await callback.message.reply(f"🗑 Сотрудник @{username} удалён.")
+    username = callback.data.removeprefix("demp_")
+    async with write_transaction():
+        await DB.execute("DELETE FROM employees WHERE username=?", (username,))
+    EMPLOYEE_USERNAMES.discard(username)
+    await reload_staff()
+    await drop_pressed_button(callback)
+    await callback.message.reply(f"🗑 Сотрудник @{username} удалён.", parse_mode=None)
     await callback.answer()
 
 
@@ -445,42 +1193,39 @@ async def delete_employee(callback: CallbackQuery) -> None:
 
 @router.message(Command("blocked"))
 async def cmd_blocked(message: Message) -> None:
-    if message.from_user.id != ADMIN_ID:
+    if message.from_user.id not in ADMIN_IDS:
         return
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT user_id, username, blocked_at FROM blocked_users ORDER BY blocked_at DESC"
-        ) as cur:
-            users = await cur.fetchall()
+    async with DB.execute(
+        "SELECT user_id, COALESCE('@' || username, 'ID: ' || user_id), substr(blocked_at, 1, 16)"
+        " FROM blocked_users ORDER BY blocked_at DESC"
+    ) as cur:
+        users = await cur.fetchall()
 
     if not users:
         await message.answer("📋 Список заблокированных пользователей пуст.")
         return
 
-    await message.answer("🚫 <b>Заблокированные пользователи:</b>", parse_mode="HTML")
-    for user_id, username, blocked_at in users:
-        uname = f"@{username}" if username else f"ID: {user_id}"
-        text = f"<code>{user_id}</code> ({uname})\n🕐 {str(blocked_at)[:16]}"
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="🔓 Разблокировать", callback_data=f"unblock_{user_id}"),
-        ]])
-        await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await answer_paged(message, "🚫 <b>Заблокированные пользователи:</b>\n", (
+        (
+            f"• <code>{user_id}</code> ({uname}) — {blocked_at}",
+            InlineKeyboardButton(text=f"🔓 Разблокировать {uname}", callback_data=f"unblock_{user_id}"),
+        )
+        for user_id, uname, blocked_at in users
+    ))
 
 
 @router.callback_query(F.data.startswith("unblock_"))
 async def unblock_user(callback: CallbackQuery) -> None:
-    if callback.from_user.id != ADMIN_ID:
+    if callback.from_user.id not in ADMIN_IDS:
         await callback.answer()
         return
-    user_id = int(callback.data.split("_")[1])
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM blocked_users WHERE user_id=?", (user_id,))
-        await db.commit()
-    await callback.message.edit_reply_markup(reply_markup=None)
-    await callback.message.reply(
-        f"🔓 Пользователь <code>{user_id}</code> разблокирован.", parse_mode="HTML"
-    )
+    user_id = int(callback.data.removeprefix("unblock_"))
+    async with write_transaction():
+        await DB.execute("DELETE FROM blocked_users WHERE user_id=?", (user_id,))
+    BLOCKED_IDS.discard(user_id)
+    await drop_pressed_button(callback)
+    await callback.message.reply(f"🔓 Пользователь <code>{user_id}</code> разблокирован.")
     await callback.answer()
 
 
@@ -491,44 +1236,31 @@ async def unblock_user(callback: CallbackQuery) -> None:
 @router.message(Command("complaint"))
 async def cmd_complaint(message: Message, state: FSMContext) -> None:
     uid = message.from_user.id
-    if await is_blocked(uid):
+    if is_blocked(uid):
         await message.answer("❌ Вы заблокированы и не можете использовать этого бота.")
         return
     await state.set_state(ComplaintForm.fio)
     await message.answer(
         "📝 <b>Подача жалобы</b>\n\nШаг 1/4: Введите ваше ФИО ((Никнейм)):",
-        parse_mode="HTML",
     )
 
 
-@router.message(ComplaintForm.fio)
+@router.message(ComplaintForm.fio, F.text)
 async def process_fio(message: Message, state: FSMContext) -> None:
-    if await is_blocked(message.from_user.id):
-        await state.clear()
-        await message.answer("❌ Вы заблокированы.")
-        return
     await state.update_data(fio=message.text)
     await state.set_state(ComplaintForm.officer_info)
     await message.answer("Шаг 2/4: Введите ФИО ((Никнейм)) или номер жетона ((Номер маски)) сотрудника, совершившего нарушение:")
 
 
-@router.message(ComplaintForm.officer_info)
+@router.message(ComplaintForm.officer_info, F.text)
 async def process_officer_info(message: Message, state: FSMContext) -> None:
-    if await is_blocked(message.from_user.id):
-        await state.clear()
-        await message.answer("❌ Вы заблокированы.")
-        return
     await state.update_data(officer_info=message.text)
     await state.set_state(ComplaintForm.violation)
     await message.answer("Шаг 3/4: Опишите, что нарушил сотрудник:")
 
 
-@router.message(ComplaintForm.violation)
+@router.message(ComplaintForm.violation, F.text)
 async def process_violation(message: Message, state: FSMContext) -> None:
-    if await is_blocked(message.from_user.id):
-        await state.clear()
-        await message.answer("❌ Вы заблокированы.")
-        return
     await state.update_data(violation=message.text)
     await state.set_state(ComplaintForm.media)
     await message.answer(
@@ -546,10 +1278,6 @@ async def skip_media(message: Message, state: FSMContext) -> None:
 
 @router.message(ComplaintForm.media, F.text)
 async def process_media_link(message: Message, state: FSMContext) -> None:
-    if await is_blocked(message.from_user.id):
-        await state.clear()
-        await message.answer("❌ Вы заблокированы.")
-        return
     text = message.text.strip()
     if not (text.startswith("http://") or text.startswith("https://")):
         await message.answer("❌ Это не ссылка. Отправьте фото, видео или ссылку (начинающуюся с http:// или https://), либо /skip чтобы пропустить.")
@@ -559,10 +1287,6 @@ async def process_media_link(message: Message, state: FSMContext) -> None:
 
 @router.message(ComplaintForm.media, F.photo | F.video | F.document)
 async def process_media(message: Message, state: FSMContext) -> None:
-    if await is_blocked(message.from_user.id):
-        await state.clear()
-        await message.answer("❌ Вы заблокированы.")
-        return
     if message.photo:
         fid, ftype = message.photo[-1].file_id, "photo"
     elif message.video:
@@ -580,167 +1304,176 @@ async def _submit_complaint(
     await state.clear()
 
     uid = message.from_user.id
+    # Checked once here rather than on every form step; /complaint already
+    # turned away users who were blocked before they started.
+    if is_blocked(uid):
+        await message.answer("❌ Вы заблокированы.")
+        return
     username = message.from_user.username
     fio = data.get("fio", "")
     officer_info = data.get("officer_info", "")
     violation = data.get("violation", "")
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute(
-            "INSERT INTO complaints (user_id, username, fio, officer_info, violation, media_file_id, media_type)"
-            " VALUES (?,?,?,?,?,?,?)",
-            (uid, username, fio, officer_info, violation, media_file_id, media_type),
-        )
-        complaint_id = cur.lastrowid
-        await db.commit()
-        recipients = await get_all_recipient_ids(db)
+    complaint_id = await insert_complaint(
+        (uid, username, fio, officer_info, violation, media_file_id, media_type)
+    )
+    recipients = get_all_recipient_ids()
 
+    text = build_complaint_text(complaint_id, format_username(username), uid, fio, officer_info, violation)
+    # Staff fan-out runs in the background; the user only waits for their ack.
+    spawn(send_complaint_to_all(message.bot, complaint_id, text, media_file_id, media_type, recipients))
     await message.answer(f"✅ Ваша жалоба №{complaint_id} успешно отправлена на рассмотрение.")
 
-    uname = f"@{username}" if username else "без username"
-    text = build_complaint_text(complaint_id, uname, uid, fio, officer_info, violation)
-    await send_complaint_to_all(message.bot, complaint_id, text, media_file_id, media_type, recipients)
-
 
 # ---------------------------------------------------------------------------
 # /complaints  (admin + employees)
 # ---------------------------------------------------------------------------
 
+# Complaints per /complaints page; more than this is hard to scroll through
+# and only burns the send budget.
+COMPLAINTS_PAGE_SIZE = 20
+
+
+async def send_pending_complaints(bot: Bot, chat_id: int, after: tuple[str, int] | None = None) -> None:
+    """Send a page of pending complaints, newest first. Pages continue from
+    the (created_at, id) of the previous page's last row rather than an
+    offset, so complaints handled in between don't shift later pages; id
+    breaks ties between rows inserted by one batch."""
+    where = "status='pending'"
+    if after:
+        where += " AND (created_at, id) < (?, ?)"
+    # One extra row tells whether a "more" button is needed.
+    async with DB.execute(
+        "SELECT id, user_id, username, fio, officer_info, violation, media_file_id, media_type, created_at"
+        f" FROM complaints WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*(after or ()), COMPLAINTS_PAGE_SIZE + 1),
+    ) as cur:
+        rows = await cur.fetchall()
+    has_more = len(rows) > COMPLAINTS_PAGE_SIZE
+    rows = rows[:COMPLAINTS_PAGE_SIZE]
+
+    def send(row: tuple):
+        cid, user_id, username, fio, officer_info, violation, fid, ftype, _ = row
+        text = build_complaint_text(cid, format_username(username), user_id, fio, officer_info, violation)
+        keyboard = complaint_keyboard(cid)
+        if fid:
+            return media_sender(ftype)(chat_id, fid, caption=text, reply_markup=keyboard)
+        return bot.send_message(chat_id, text, reply_markup=keyboard)
+
+    # One after another: all go to the same chat, where Telegram throttles
+    # anyway, and concurrent sends would arrive out of order.
+    for row in rows:
+        try:
+            await send(row)
+        except TelegramAPIError as e:
+            logger.warning("Error sending complaint %s: %s", row[0], e)
+
+    if has_more:
+        last_id, last_created_at = rows[-1][0], rows[-1][-1]
+        await bot.send_message(chat_id, "Есть ещё активные жалобы.", reply_markup=InlineKeyboardMarkup(
+            inline_keyboard=[[
+                InlineKeyboardButton(
+                    text="⬇️ Показать ещё", callback_data=f"complaints_next_{last_created_at}_{last_id}",
+                ),
+            ]],
+        ))
+
+
 @router.message(Command("complaints"))
 async def cmd_complaints(message: Message) -> None:
     uid = message.from_user.id
-    if not await is_staff(uid):
+    if not is_staff(uid):
         return
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT id, user_id, username, fio, officer_info, violation, media_file_id, media_type"
-            " FROM complaints WHERE status='pending' ORDER BY created_at DESC"
-        ) as cur:
-            rows = await cur.fetchall()
+    async with DB.execute("SELECT COUNT(*) FROM complaints WHERE status='pending'") as cur:
+        (total,) = await cur.fetchone()
 
-    if not rows:
+    if not total:
         await message.answer("📋 Нет активных жалоб.")
         return
 
-    await message.answer(f"📋 <b>Активные жалобы ({len(rows)}):</b>", parse_mode="HTML")
-    bot: Bot = message.bot
-    for row in rows:
-        cid, user_id, username, fio, officer_info, violation, fid, ftype = row
-        uname = f"@{username}" if username else "без username"
-        text = build_complaint_text(cid, uname, user_id, fio, officer_info, violation)
-        keyboard = complaint_keyboard(cid)
-        try:
-            if fid:
-                send_fn = {
-                    "photo": bot.send_photo,
-                    "video": bot.send_video,
-                    "document": bot.send_document,
-                }.get(ftype, bot.send_document)
-                await send_fn(message.chat.id, fid, caption=text, parse_mode="HTML", reply_markup=keyboard)
-            else:
-                await bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=keyboard)
-        except Exception as e:
-            logger.warning("Error sending complaint %s: %s", cid, e)
+    await message.answer(f"📋 <b>Активные жалобы ({total}):</b>")
+    await send_pending_complaints(message.bot, message.chat.id)
+
+
+@router.callback_query(F.data.startswith("complaints_next_"))
+async def complaints_next_page(callback: CallbackQuery) -> None:
+    if not is_staff(callback.from_user.id):
+        await callback.answer("Нет доступа.", show_alert=True)
+        return
+    created_at, _, last_id = callback.data.removeprefix("complaints_next_").rpartition("_")
+    await callback.answer()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await send_pending_complaints(callback.bot, callback.message.chat.id, (created_at, int(last_id)))
 
 
 # ---------------------------------------------------------------------------
 # Callback: accept
 # ---------------------------------------------------------------------------
 
-@router.callback_query(F.data.startswith("accept_"))
-async def accept_complaint(callback: CallbackQuery) -> None:
-    if not await is_staff(callback.from_user.id):
+@router.callback_query(ComplaintCB.filter(F.action == "accept"))
+async def accept_complaint(callback: CallbackQuery, callback_data: ComplaintCB) -> None:
+    if not is_staff(callback.from_user.id):
         await callback.answer("Нет доступа.", show_alert=True)
         return
 
-    complaint_id = int(callback.data.split("_")[1])
+    complaint_id = callback_data.cid
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT user_id, status FROM complaints WHERE id=?", (complaint_id,)) as cur:
-            row = await cur.fetchone()
-        if not row:
-            await callback.answer("Жалоба не найдена.", show_alert=True)
-            return
-        user_id, status = row
-        if status != "pending":
-            await callback.answer("Эта жалоба уже обработана.", show_alert=True)
-            return
-        await db.execute(
-            "UPDATE complaints SET status='accepted', accepted_by=? WHERE id=?",
-            (callback.from_user.id, complaint_id),
-        )
-        await db.commit()
-
-    try:
-        await callback.bot.send_message(user_id, f"✅ Ваша жалоба №{complaint_id} принята.")
-    except Exception as e:
-        logger.warning("Could not notify user %s: %s", user_id, e)
+    complaint = await submit_write("accept", (callback.from_user.id, complaint_id))
+    if not complaint:
+        await callback.answer("Жалоба не найдена или уже обработана.", show_alert=True)
+        return
+    user_id = complaint.user_id
+    # Release the button spinner as soon as the decision is stored.
+    await callback.answer()
 
+    spawn(notify_user(callback.bot, user_id, f"✅ Ваша жалоба №{complaint_id} принята."))
     await invalidate_complaint_messages(callback.bot, complaint_id)
     actor = callback.from_user.username or str(callback.from_user.id)
     await callback.message.reply(f"✅ Жалоба #{complaint_id} принята (@{actor}). Пользователь уведомлён.")
-    await log_complaint_to_group(callback.bot, complaint_id, "принята",
-                                  callback.from_user.id, callback.from_user.username)
-    await callback.answer()
+    queue_group_log(callback.bot, complaint, "принята",
+                    callback.from_user.id, callback.from_user.username)
 
 
 # ---------------------------------------------------------------------------
 # Callback: block
 # ---------------------------------------------------------------------------
 
-@router.callback_query(F.data.startswith("block_"))
-async def block_user_callback(callback: CallbackQuery) -> None:
-    if not await is_staff(callback.from_user.id):
+@router.callback_query(ComplaintCB.filter(F.action == "block"))
+async def block_user_callback(callback: CallbackQuery, callback_data: ComplaintCB) -> None:
+    if not is_staff(callback.from_user.id):
         await callback.answer("Нет доступа.", show_alert=True)
         return
 
-    complaint_id = int(callback.data.split("_")[1])
+    complaint_id = callback_data.cid
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT user_id, username, status FROM complaints WHERE id=?", (complaint_id,)
-        ) as cur:
-            row = await cur.fetchone()
-        if not row:
-            await callback.answer("Жалоба не найдена.", show_alert=True)
-            return
-        user_id, username, status = row
-        if status != "pending":
-            await callback.answer("Эта жалоба уже обработана.", show_alert=True)
-            return
-        await db.execute(
-            "INSERT OR IGNORE INTO blocked_users (user_id, username) VALUES (?,?)",
-            (user_id, username),
-        )
-        await db.execute(
-            "UPDATE complaints SET status='blocked', accepted_by=? WHERE id=?",
-            (callback.from_user.id, complaint_id),
-        )
-        await db.commit()
+    complaint = await submit_write("block", (callback.from_user.id, complaint_id))
+    if not complaint:
+        await callback.answer("Жалоба не найдена или уже обработана.", show_alert=True)
+        return
+    user_id, username = complaint.user_id, complaint.username
+    BLOCKED_IDS.add(user_id)
+    await callback.answer()
 
     uname = f"@{username}" if username else f"ID: {user_id}"
     await invalidate_complaint_messages(callback.bot, complaint_id)
     actor = callback.from_user.username or str(callback.from_user.id)
     await callback.message.reply(f"🚫 Пользователь {uname} заблокирован (@{actor}).")
-    await callback.answer()
 
 
 # ---------------------------------------------------------------------------
 # Callback: reject  (ask for reason)
 # ---------------------------------------------------------------------------
 
-@router.callback_query(F.data.startswith("reject_"))
-async def reject_start(callback: CallbackQuery, state: FSMContext) -> None:
-    if not await is_staff(callback.from_user.id):
+@router.callback_query(ComplaintCB.filter(F.action == "reject"))
+async def reject_start(callback: CallbackQuery, callback_data: ComplaintCB, state: FSMContext) -> None:
+    if not is_staff(callback.from_user.id):
         await callback.answer("Нет доступа.", show_alert=True)
         return
 
-    complaint_id = int(callback.data.split("_")[1])
+    complaint_id = callback_data.cid
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT status FROM complaints WHERE id=?", (complaint_id,)) as cur:
-            row = await cur.fetchone()
+    row = await fetch_one("SELECT status FROM complaints WHERE id=?", (complaint_id,))
 
     if not row:
         await callback.answer("Жалоба не найдена.", show_alert=True)
@@ -749,15 +1482,29 @@ async def reject_start(callback: CallbackQuery, state: FSMContext) -> None:
         await callback.answer("Эта жалоба уже обработана.", show_alert=True)
         return
 
+    await callback.answer()
     await state.set_state(RejectForm.reason)
     await state.update_data(complaint_id=complaint_id)
     await callback.message.reply(f"✍️ Введите причину отклонения жалобы #{complaint_id}:")
-    await callback.answer()
 
 
-@router.message(RejectForm.reason)
+# Keyboards sent before ComplaintCB carry "<action>_<id>" and may still sit in
+# staff chats; route them to the same handlers.
+@router.callback_query(F.data.regexp(r"^(accept|reject|block)_(\d+)$").as_("legacy"))
+async def legacy_complaint_action(callback: CallbackQuery, legacy: re.Match, state: FSMContext) -> None:
+    action, cid = legacy[1], int(legacy[2])
+    callback_data = ComplaintCB(action=action, cid=cid)
+    if action == "accept":
+        await accept_complaint(callback, callback_data)
+    elif action == "block":
+        await block_user_callback(callback, callback_data)
+    else:
+        await reject_start(callback, callback_data, state)
+
+
+@router.message(RejectForm.reason, F.text)
 async def reject_reason(message: Message, state: FSMContext) -> None:
-    if not await is_staff(message.from_user.id):
+    if not is_staff(message.from_user.id):
         await state.clear()
         return
 
@@ -765,120 +1512,267 @@ async def reject_reason(message: Message, state: FSMContext) -> None:
     complaint_id = data.get("complaint_id")
     await state.clear()
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT user_id, status FROM complaints WHERE id=?", (complaint_id,)) as cur:
-            row = await cur.fetchone()
-        if not row:
-            await message.answer("❌ Жалоба не найдена.")
-            return
-        user_id, status = row
-        if status != "pending":
-            await message.answer("⚠️ Эта жалоба уже обработана.")
-            return
-        await db.execute(
-            "UPDATE complaints SET status='rejected', accepted_by=? WHERE id=?",
-            (message.from_user.id, complaint_id),
-        )
-        await db.commit()
+    complaint = await submit_write("reject", (message.from_user.id, complaint_id))
+    if not complaint:
+        await message.answer("⚠️ Жалоба не найдена или уже обработана.")
+        return
+    user_id = complaint.user_id
 
     try:
         await message.bot.send_message(
             user_id,
             f"❌ Ваша жалоба №{complaint_id} отклонена.\n\n📝 <b>Причина:</b> {message.text}",
-            parse_mode="HTML",
         )
-    except Exception as e:
+    except TelegramAPIError as e:
         logger.warning("Could not notify user %s: %s", user_id, e)
 
     await invalidate_complaint_messages(message.bot, complaint_id)
     actor = message.from_user.username or str(message.from_user.id)
     await message.answer(f"❌ Жалоба #{complaint_id} отклонена (@{actor}). Пользователь уведомлён.")
-    await log_complaint_to_group(message.bot, complaint_id, "отклонена",
-                                  message.from_user.id, message.from_user.username,
-                                  reason=message.text)
+    queue_group_log(message.bot, complaint, "отклонена",
+                    message.from_user.id, message.from_user.username,
+                    reason=message.text)
+
+
+# ---------------------------------------------------------------------------
+# Non-text answers at text steps
+# ---------------------------------------------------------------------------
+
+# Registered after the F.text step handlers, so it only sees photos, stickers
+# and the like that would otherwise be ignored and leave the user stuck.
+@router.message(StateFilter(
+    EmployeeRegisterForm.fio, EmployeeRegisterForm.position,
+    EmployeeRegisterForm.rank, EmployeeRegisterForm.nickname,
+    AddEmployeeForm.username,
+    ComplaintForm.fio, ComplaintForm.officer_info, ComplaintForm.violation,
+    RejectForm.reason,
+))
+async def text_step_expected(message: Message) -> None:
+    await message.answer("✍️ Пожалуйста, отправьте ответ текстом.")
 
 
 # ---------------------------------------------------------------------------
 # Group logging
 # ---------------------------------------------------------------------------
 
-async def log_complaint_to_group(
+# Log cards are queued so a burst of decisions does not hold up the deciding
+# handlers. Whatever queues up within LOG_BATCH_WINDOW is posted together as
+# one media group plus combined text messages, with at most LOG_WORKERS
+# batches being posted at a time.
+LOG_WORKERS = 4
+LOG_BATCH_SIZE = 10  # sendMediaGroup accepts 2-10 items
+LOG_BATCH_WINDOW = 0.2  # seconds
+LOG_CARD_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+# None is queued once on shutdown, after the last accepted card.
+_log_queue: asyncio.Queue[tuple | None] = asyncio.Queue()
+_log_slots = asyncio.Semaphore(LOG_WORKERS)
+_log_task: asyncio.Task | None = None
+_log_closed = False
+
+
+LOG_COMPLAINT_TEMPLATE = (
+    "{emoji} <b>Жалоба №{complaint_id} {action}</b> ({actor})\n\n" + COMPLAINT_BODY_TEMPLATE
+)
+LOG_REASON_TEMPLATE = "\n📝 <b>Причина отказа:</b> {reason}"
+LOG_LINK_TEMPLATE = "\n🔗 <b>Доказательство:</b> {link}"
+LOG_STAFF_TEMPLATE = (
+    "👮 <b>Карточка сотрудника</b> (жалоба №{complaint_id})\n\n"
+    "📛 Никнейм: {nickname}\n"
+    "📋 ФИО: {fio}\n"
+    "🏷 Должность: {position}\n"
+    "⭐ Звание: {rank}\n"
+    "🔗 Telegram: {actor}"
+)
+LOG_ADMIN_TEMPLATE = (
+    "👮 <b>Карточка сотрудника</b> (жалоба №{complaint_id})\n\n"
+    "🔗 Telegram: {actor}\n"
+    "🆔 ID: <code>{actor_id}</code>\n"
+    "(Администратор)"
+)
+
+
+@dataclass(slots=True)
+class LogCard:
+    complaint_id: int
+    complaint_text: str
+    staff_text: str
+    media_file_id: str | None  # photo/video/document only; links are in the text
+    media_type: str | None
+
+
+def _queue_group_log(
     bot: Bot,
-    complaint_id: int,
-    action: str,          # "принята" | "отклонена"
+    complaint: ComplaintRow,
+    action: str,
     actor_id: int,
     actor_username: str | None,
     reason: str | None = None,
 ) -> None:
-    if not LOG_CHAT_ID:
+    if _log_closed:
+        logger.warning("Log group posting is shut down; complaint %s not logged", complaint.id)
         return
+    _log_queue.put_nowait((bot, complaint, action, actor_id, actor_username, reason))
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT user_id, username, fio, officer_info, violation, media_file_id, media_type"
-            " FROM complaints WHERE id=?", (complaint_id,)
-        ) as cur:
-            c = await cur.fetchone()
-        async with db.execute(
-            "SELECT fio, position, rank, nickname FROM employees WHERE user_id=?", (actor_id,)
-        ) as cur:
-            emp = await cur.fetchone()
-
-    if not c:
-        return
 
-    user_id, username, fio, officer_info, violation, media_file_id, media_type = c
+def build_log_card(
+    complaint: ComplaintRow,
+    action: str,          # "принята" | "отклонена"
+    actor_id: int,
+    actor_username: str | None,
+    reason: str | None = None,
+) -> LogCard:
+    # The row comes from the status UPDATE's RETURNING, so no lookup here.
+    complaint_id, user_id, username = complaint.id, complaint.user_id, complaint.username
+    media_file_id, media_type = complaint.media_file_id, complaint.media_type
+    emp = EMPLOYEE_CARDS.get(actor_id)
 
     # Message 1: media (if any) + complaint card as separate messages — same as employees receive
-    action_emoji = "✅" if action == "принята" else "❌"
     actor_uname = f"@{actor_username}" if actor_username else f"ID: {actor_id}"
-    uname = f"@{username}" if username else f"ID: {user_id}"
-
-    header = f"{action_emoji} <b>Жалоба №{complaint_id} {action}</b> ({actor_uname})\n\n"
-    complaint_text = (
-        header
-        + build_complaint_text(complaint_id, uname, user_id, fio, officer_info, violation).split("\n\n", 1)[1]
+    complaint_text = LOG_COMPLAINT_TEMPLATE.format(
+        emoji="✅" if action == "принята" else "❌", complaint_id=complaint_id, action=action,
+        actor=actor_uname, uname=f"@{username}" if username else f"ID: {user_id}", user_id=user_id,
+        fio=complaint.fio, officer_info=complaint.officer_info, violation=complaint.violation,
     )
     if reason:
-        complaint_text += f"\n📝 <b>Причина отказа:</b> {reason}"
-    if media_type == "link" and media_file_id:
-        complaint_text += f"\n🔗 <b>Доказательство:</b> {media_file_id}"
-
-    try:
-        if media_file_id and media_type != "link":
-            send_fn = {
-                "photo": bot.send_photo,
-                "video": bot.send_video,
-                "document": bot.send_document,
-            }.get(media_type, bot.send_document)
-            await send_fn(LOG_CHAT_ID, media_file_id)
-        await bot.send_message(LOG_CHAT_ID, complaint_text, parse_mode="HTML")
-    except Exception as e:
-        logger.warning("Could not send complaint card to log group: %s", e)
-        return
-
-    # Message 2: staff card
+        complaint_text += LOG_REASON_TEMPLATE.format(reason=reason)
+    if media_type == "link":
+        if media_file_id:
+            complaint_text += LOG_LINK_TEMPLATE.format(link=media_file_id)
+        media_file_id = media_type = None
+
+    # Message 2: staff card. It names the complaint because the cards are
+    # sent concurrently and may arrive in either order.
     if emp:
         emp_fio, emp_position, emp_rank, emp_nickname = emp
-        staff_text = (
-            f"👮 <b>Карточка сотрудника</b>\n\n"
-            f"📛 Никнейм: {emp_nickname or '—'}\n"
-            f"📋 ФИО: {emp_fio or '—'}\n"
-            f"🏷 Должность: {emp_position or '—'}\n"
-            f"⭐ Звание: {emp_rank or '—'}\n"
-            f"🔗 Telegram: {actor_uname}"
+        staff_text = LOG_STAFF_TEMPLATE.format(
+            complaint_id=complaint_id, nickname=emp_nickname or "—", fio=emp_fio or "—",
+            position=emp_position or "—", rank=emp_rank or "—", actor=actor_uname,
         )
     else:
-        staff_text = (
-            f"👮 <b>Карточка сотрудника</b>\n\n"
-            f"🔗 Telegram: {actor_uname}\n"
-            f"🆔 ID: <code>{actor_id}</code>\n"
-            f"(Администратор)"
-        )
+        staff_text = LOG_ADMIN_TEMPLATE.format(complaint_id=complaint_id, actor=actor_uname, actor_id=actor_id)
+    return LogCard(complaint_id, complaint_text, staff_text, media_file_id, media_type)
+
+
+async def post_log_card(bot: Bot, card: LogCard) -> None:
+    async def send_complaint_card() -> None:
+        if card.media_file_id:
+            await media_sender(card.media_type)(CFG.log_chat_id, card.media_file_id)
+        await bot.send_message(CFG.log_chat_id, card.complaint_text)
+
+    complaint_result, staff_result = await asyncio.gather(
+        send_complaint_card(),
+        bot.send_message(CFG.log_chat_id, card.staff_text),
+        return_exceptions=True,
+    )
+    for kind, result in (("complaint", complaint_result), ("staff", staff_result)):
+        if isinstance(result, TelegramAPIError):
+            logger.warning("Could not send %s card to log group: %s", kind, result)
+        elif isinstance(result, BaseException):
+            raise result
+
+
+async def post_log_batch(bot: Bot, cards: list[LogCard]) -> None:
+    """Post several log cards: photos and videos as one media group, other
+    files one by one, then all texts joined into as few messages as fit."""
+    if len(cards) == 1:
+        await post_log_card(bot, cards[0])
+        return
+
+    chat_id = CFG.log_chat_id
+    visual = [c for c in cards if c.media_type in ("photo", "video")]
+    files = [c for c in cards if c.media_file_id and c not in visual]
+    if len(visual) == 1:
+        files.insert(0, visual.pop())
+
+    media_sends = [
+        media_sender(c.media_type)(chat_id, c.media_file_id, caption=f"Жалоба №{c.complaint_id}")
+        for c in files
+    ]
+    if visual:
+        media_sends.append(bot.send_media_group(chat_id, [
+            (InputMediaPhoto if c.media_type == "photo" else InputMediaVideo)(
+                media=c.media_file_id, caption=f"Жалоба №{c.complaint_id}",
+            )
+            for c in visual
+        ]))
+    for result in await asyncio.gather(*media_sends, return_exceptions=True):
+        if isinstance(result, TelegramAPIError):
+            logger.warning("Could not send complaint media to log group: %s", result)
+        elif isinstance(result, BaseException):
+            raise result
+
+    # Texts go out in order after the media they refer to.
+    text, limit = "", PAGE_MAX_CHARS
+    for c in cards:
+        part = f"{c.complaint_text}\n\n{c.staff_text}"
+        if text and len(text) + len(LOG_CARD_SEPARATOR) + len(part) > limit:
+            await _send_log_text(bot, text)
+            text = ""
+        text = f"{text}{LOG_CARD_SEPARATOR}{part}" if text else part
+    await _send_log_text(bot, text)
+
+
+async def _send_log_text(bot: Bot, text: str) -> None:
+    try:
+        await bot.send_message(CFG.log_chat_id, text)
+    except TelegramAPIError as e:
+        logger.warning("Could not send complaint cards to log group: %s", e)
+
+
+async def _post_queued_logs(batch: list[tuple]) -> None:
     try:
-        await bot.send_message(LOG_CHAT_ID, staff_text, parse_mode="HTML")
-    except Exception as e:
-        logger.warning("Could not send staff card to log group: %s", e)
+        await post_log_batch(batch[0][0], [build_log_card(*args) for _, *args in batch])
+    except Exception:
+        logger.exception("Could not post %d complaint(s) to the log group", len(batch))
+    finally:
+        _log_slots.release()
+
+
+async def log_dispatcher() -> None:
+    while True:
+        batch = await collect_batch(_log_queue, LOG_BATCH_SIZE, LOG_BATCH_WINDOW)
+        stopping = batch[-1] is None
+        if stopping:
+            batch.pop()
+        if batch:
+            await _log_slots.acquire()
+            spawn(_post_queued_logs(batch))
+        if stopping:
+            return
+
+
+async def _start_log_workers() -> None:
+    global _log_task
+    _log_task = asyncio.create_task(log_dispatcher())
+
+
+async def stop_log_workers() -> None:
+    """Refuse new cards, post everything already queued and wait for the
+    posts in flight, so decisions made just before a restart are logged."""
+    global _log_closed
+    if _log_task is None or _log_closed:
+        return
+    _log_closed = True
+    _log_queue.put_nowait(None)
+    await _log_task
+    # Each post holds a slot until it finishes.
+    for _ in range(LOG_WORKERS):
+        await _log_slots.acquire()
+
+
+def _noop_queue_group_log(*args: Any, **kwargs: Any) -> None:
+    pass
+
+
+async def _noop_start_log_workers() -> None:
+    pass
+
+
+# LOG_CHAT_ID is fixed for the life of the process, so when logging is off
+# the entry points are bound to no-ops once instead of checked per call.
+queue_group_log = _queue_group_log if CFG.log_chat_id else _noop_queue_group_log
+start_log_workers = _start_log_workers if CFG.log_chat_id else _noop_start_log_workers
 
 
 # ---------------------------------------------------------------------------
@@ -886,19 +1780,40 @@ async def log_complaint_to_group(
 # ---------------------------------------------------------------------------
 
 async def main() -> None:
-    if not BOT_TOKEN:
-        raise ValueError("BOT_TOKEN не задан в .env")
-    if not ADMIN_ID:
-        raise ValueError("ADMIN_ID не задан в .env")
-
+    await open_db()
     await init_db()
-    bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    session = AiohttpSession(
+        limit=100,
+        json_loads=orjson.loads,
+        json_dumps=lambda value: orjson.dumps(value).decode(),
+    )
+    # aiohttp drops idle keep-alive connections after 15 s, shorter than the
+    # usual gap between bursts of staff actions, so most bursts would start
+    # with a fresh TLS handshake. AiohttpSession has no public option for it.
+    session._connector_init["keepalive_timeout"] = 75
+    bot = Bot(token=CFG.bot_token, session=session, default=DefaultBotProperties(parse_mode="HTML"))
+    bot.session.middleware(SendScheduler())
+    bind_media_senders(bot)
+    # Polling runs every update as its own task; isolation takes a per-chat
+    # lock before FSM state is loaded, so two quick messages from one user
+    # can't race through the same form step.
+    dp = Dispatcher(storage=DictStorage(), events_isolation=ChatEventIsolation())
     dp.include_router(router)
+    dp.startup.register(start_db_writer)
+    dp.startup.register(start_log_workers)
+    dp.startup.register(start_db_maintenance)
+    dp.shutdown.register(stop_db_maintenance)
+    dp.shutdown.register(stop_log_workers)
+    dp.shutdown.register(stop_db_writer)
+    dp.shutdown.register(close_db)
 
-    logger.info("Бот запущен. Admin ID: %s", ADMIN_ID)
-    await dp.start_polling(bot, skip_updates=True)
+    # aiogram 3 ignores start_polling(skip_updates=...); drop the backlog
+    # explicitly instead.
+    await bot.delete_webhook(drop_pending_updates=True)
+    logger.info("Бот запущен. Admin ID: %s", CFG.admin_id)
+    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop else None) as runner:
+        runner.run(main())